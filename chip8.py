@@ -1,7 +1,10 @@
 import pygame
+import numpy as np
 from array import array
 import datetime
-import random
+import os
+import struct
+import time
 
 SCALE_FACTOR = 8
 PIXEL_OFF = (0, 0, 0)
@@ -13,6 +16,8 @@ SHIFT_VY_8XY6_8XYE = False  # False is the modern way; True matches original
 # Tweak this per ROM - how many microseconds to wait before executing an instruction.  Smaller means more frequent
 # instruction executions, which makes things faster.
 INSTRUCTION_DELAY = 2000
+# The delay and sound timers count down at 60 Hz; this is one tick in nanoseconds
+TIMER_TICK_NS = 1000000000 // 60
 
 
 # The keyboard layout for the CHIP-8 assumes:
@@ -47,107 +52,106 @@ KEYMAPPING = {
 }
 
 
+# The 0..F font, 5 bytes per character.  See C8Computer.load_font_sprites.
+FONT_SPRITES = bytes([0xF0, 0x90, 0x90, 0x90, 0xF0,  # 0
+                      0x20, 0x60, 0x20, 0x20, 0x70,  # 1
+                      0xF0, 0x10, 0xF0, 0x80, 0xF0,  # 2
+                      0xF0, 0x10, 0xF0, 0x10, 0xF0,  # 3
+                      0x90, 0x90, 0xF0, 0x10, 0x10,  # 4
+                      0xF0, 0x80, 0xF0, 0x10, 0xF0,  # 5
+                      0xF0, 0x80, 0xF0, 0x90, 0xF0,  # 6
+                      0xF0, 0x10, 0x20, 0x40, 0x40,  # 7
+                      0xF0, 0x90, 0xF0, 0x90, 0xF0,  # 8
+                      0xF0, 0x90, 0xF0, 0x10, 0xF0,  # 9
+                      0xF0, 0x90, 0xF0, 0x90, 0x90,  # A
+                      0xE0, 0x90, 0xE0, 0x90, 0xE0,  # B
+                      0xF0, 0x80, 0x80, 0x80, 0xF0,  # C
+                      0xE0, 0x90, 0x90, 0x90, 0xE0,  # D
+                      0xF0, 0x80, 0xF0, 0x80, 0xF0,  # E
+                      0xF0, 0x80, 0xF0, 0x80, 0x80])  # F
+
+
+# Fx29 points I at the font sprite for digit Vx.  Each character is 5 bytes, with "0" starting at 0x00 in memory.
+FONT_ADDRESSES = tuple(range(0, len(FONT_SPRITES), 5))
+
+
+# Fx33 stores Vx as three decimal digits.  Vx is a byte, so the digits for all 256 values are computed once here.
+BCD_DIGITS = [bytes((val // 100, val // 10 % 10, val % 10)) for val in range(256)]
+
+
+# Reads the big-endian 16-bit opcode at a given offset in RAM: read_opcode(RAM, PC)[0]
+read_opcode = struct.Struct('>H').unpack_from
+
+
 class InvalidOpCodeException(Exception):
     pass
 
 
+def ram_slice_end(start, length):
+    # Returns start + length, the end of a slice of RAM, raising IndexError if the slice runs past the end of RAM.
+    # RAM is a bytearray, and slicing past its end does not fail on its own: a read comes back short and a write makes
+    # RAM longer.  This is an explicit check rather than an assert so it still applies under python -O.
+    end = start + length
+    if end > 4096:
+        raise IndexError("RAM access 0x{:X}..0x{:X} runs past the end of RAM".format(start, end - 1))
+    return end
+
+
 def build_pygame_sound_samples():
     # modified from: https://gist.github.com/ohsqueezy/6540433
+    # One period of a 440 Hz square wave: the first half at +amplitude, the second half at -amplitude
     period = int(round(pygame.mixer.get_init()[0] / 440))
-    samples = array("h", [0] * period)
     amplitude = 2 ** (abs(pygame.mixer.get_init()[1]) - 1) - 1
-    for time in range(period):
-        if time < period / 2:
-            samples[time] = amplitude
-        else:
-            samples[time] = -amplitude
-    return samples
+    samples = np.where(np.arange(period) < period / 2, amplitude, -amplitude).astype(np.int16)
+    return array("h", samples.tobytes())
 
 
 class C8Computer:
 
     def __init__(self, screen, beep):
-        # 4096 Bytes of RAM
-        self.RAM = array('B', [0 for i in range(4096)])
+        # 4096 Bytes of RAM.  RAM and the registers are bytearrays, which CPython indexes faster than array('B').
+        self.RAM = bytearray(4096)
         # The 16 registers are named V0..VF
-        self.V = array('B', [0 for i in range(16)])
+        self.V = bytearray(16)
         # Special-purpose 16-bit register; low 12 are used for an address
         self.I = 0
         self.delay_register = 0
-        self.delay_register_last_tick_time = None
         self.sound_register = 0
-        self.sound_register_last_tick_time = None
+        self.timer_last_tick_time = time.perf_counter_ns()
         # Program Counter
         self.PC = 0x200
-        # One could use RAM for the stack and use a stack pointer but a python List is simpler.
-        self.stack = []
+        # The stack holds up to 16 return addresses.  It is preallocated, and SP is the index of the next free slot,
+        # so CALL and RET are a plain store/load with no list growing and shrinking.
+        self.stack = array('H', [0 for i in range(16)])
+        self.SP = 0
+        # Random bytes for Cxkk, drawn from the OS 4096 at a time and handed out one per instruction
+        self.random_pool = os.urandom(4096)
+        self.random_index = 0
+        # Decoded-instruction cache mirroring RAM: decoded[addr] is decode() of the opcode at addr, filled in the
+        # first time addr is executed.  Anything that writes to RAM must call _invalidate_decoded().
+        self.decoded = [None for i in range(4096)]
         self.load_font_sprites()
         self.beep = beep
         self.screen = screen
-        self.keys_pressed = [0 for i in range(16)]  # used for the Ex9E and ExA1 instructions
+        self.keys_pressed = bytearray(16)  # used for the Ex9E and ExA1 instructions
         self.blocking_on_fx0a = False
         self.fx0a_key_pressed = None
         self.fx0a_key_up = None
 
-        # Using a list of functions to speed the lookup, vs. doing a big nested
-        # if/else.  There is one instruction for each of the high-order nibbles
-        # 1, 2, 3, 4, 5, 6, 7, 9, A, B, and C.  The others (0, 8, E, F) have
-        # multiple.
-        self.operation_list = [
-            self._0_opcodes, self._1nnn, self._2nnn, self._3xkk, self._4xkk, self._5xy0,
-            self._6xkk, self._7xkk, self._8_opcodes, self._9xy0, self._Annn, self._Bnnn,
-            self._Cxkk, self._Dxyn, self._E_opcodes, self._F_opcodes
-        ]
-
-        # opcodes beginning with 8 can be determined based on the least-significant
-        # nibble (0..7 and E)
-        self._8_operations = [
-            self._8xy0, self._8xy1, self._8xy2, self._8xy3, self._8xy4, self._8xy5,
-            self._8xy6, self._8xy7, self.invalid_op, self.invalid_op,
-            self.invalid_op, self.invalid_op, self.invalid_op, self.invalid_op,
-            self._8xyE, self.invalid_op
-        ]
-
-        # opcodes beginning with F can be determined based on the least_significant
-        # byte (07, 0A, 15, 18, 1E, 29, 33, 55, and 65).  Since this is sparse,
-        # will use a dictionary.
-        self._F_operations = {
-            0x07 : self._Fx07,
-            0x0A : self._Fx0A,
-            0x15 : self._Fx15,
-            0x18 : self._Fx18,
-            0x1E : self._Fx1E,
-            0x29 : self._Fx29,
-            0x33 : self._Fx33,
-            0x55 : self._Fx55,
-            0x65 : self._Fx65
-        }
-
     def debug_dump(self):
         outfile = open("debug.txt", "w")
         outfile.write("PC: 0x{}\n".format(hex(self.PC).upper()[2:]))
         outfile.write("Next instr.: 0x{}\n".format(hex(self.RAM[self.PC] << 8 | self.RAM[self.PC + 1]).upper()[2:]))
         outfile.write("I: 0x{}\n".format(hex(self.I).upper()[2:]))
-        for i in range(16):
-            outfile.write("V{}: 0x{}".format(hex(i).upper()[2], hex(self.V[i])[2:].zfill(2).upper()))
-            if i % 4 == 3:
-                outfile.write('\n')
-            else:
-                outfile.write('\t')
+        outfile.write("".join("V{:X}: 0x{:02X}{}".format(i, self.V[i], '\n' if i % 4 == 3 else '\t') for i in range(16)))
         outfile.write("delay register: 0x{}\n".format(hex(self.delay_register).upper()[2:]))
         outfile.write("sound register: 0x{}\n".format(hex(self.sound_register).upper()[2:]))
-        outfile.write("stack: [")
-        if len(self.stack) > 0:
-            for i in range(len(self.stack) - 1):
-                outfile.write("0x{}, ".format(hex(self.stack[i]).upper()[2:]))
-            outfile.write("0x{}]\n".format(hex(self.stack[-1]).upper()[2:]))
+        outfile.write("stack: [{}]\n".format(", ".join("0x{:X}".format(addr) for addr in self.stack[:self.SP])))
         outfile.write("\n\nRAM:\n")
-        for i in range(4096):
-            if i % 32 == 0:
-                outfile.write("0x{} - 0x{}:  ".format(hex(i)[2:].zfill(3).upper(), hex(i+31)[2:].zfill(3).upper()))
-            outfile.write(hex(self.RAM[i])[2:].zfill(2).upper())
-            if i % 32 == 31:
-                outfile.write("\n")
+        # Two hex digits per byte, written out 32 bytes per line
+        ram_hex = bytes(self.RAM).hex().upper()
+        outfile.write("".join("0x{:03X} - 0x{:03X}:  {}\n".format(i, i + 31, ram_hex[2 * i:2 * (i + 32)])
+                              for i in range(0, 4096, 32)))
 
         outfile.close()
 
@@ -167,78 +171,56 @@ class C8Computer:
         0x000.
         '''
 
-        font = [0xF0, 0x90, 0x90, 0x90, 0xF0,  # 0
-                0x20, 0x60, 0x20, 0x20, 0x70,  # 1
-                0xF0, 0x10, 0xF0, 0x80, 0xF0,  # 2
-                0xF0, 0x10, 0xF0, 0x10, 0xF0,  # 3
-                0x90, 0x90, 0xF0, 0x10, 0x10,  # 4
-                0xF0, 0x80, 0xF0, 0x10, 0xF0,  # 5
-                0xF0, 0x80, 0xF0, 0x90, 0xF0,  # 6
-                0xF0, 0x10, 0x20, 0x40, 0x40,  # 7
-                0xF0, 0x90, 0xF0, 0x90, 0xF0,  # 8
-                0xF0, 0x90, 0xF0, 0x10, 0xF0,  # 9
-                0xF0, 0x90, 0xF0, 0x90, 0x90,  # A
-                0xE0, 0x90, 0xE0, 0x90, 0xE0,  # B
-                0xF0, 0x80, 0x80, 0x80, 0xF0,  # C
-                0xE0, 0x90, 0x90, 0x90, 0xE0,  # D
-                0xF0, 0x80, 0xF0, 0x80, 0xF0,  # E
-                0xF0, 0x80, 0xF0, 0x80, 0x80]  # F
-        for i in range(80):
-            self.RAM[i] = font[i]
+        self.RAM[0:len(FONT_SPRITES)] = FONT_SPRITES
+        self._invalidate_decoded(0, len(FONT_SPRITES))
 
     def load_rom(self, rom_file="IBMLogo.ch8"):
-        i = 0x200
-        infile = open(rom_file, "rb")
-        done = False
-        while not done:
-            nextbyte = infile.read(1)
-            if not nextbyte:
-                done = True
-            else:
-                self.RAM[i] = int.from_bytes(nextbyte, 'big')
-                i += 1
-
-    def fetch(self):
-        # All instructions start on even memory addresses
-        # assert (self.PC % 2 == 0)
-        # Cannot exceed RAM boundary for programs
-        assert (0x200 <= self.PC <= 0xFFE)
-        return self.RAM[self.PC] << 8 | self.RAM[self.PC + 1]
+        with open(rom_file, "rb") as infile:
+            data = infile.read()
+        # Programs are loaded at 0x200 and cannot extend past the end of RAM
+        end = ram_slice_end(0x200, len(data))
+        self.RAM[0x200:end] = data
+        self._invalidate_decoded(0x200, end)
+
+    def _invalidate_decoded(self, start, end):
+        # RAM[start:end] was written, so drop any cached decodes that read those bytes.  An opcode is two bytes, so
+        # the one starting at start - 1 is stale too.
+        start = max(start - 1, 0)
+        self.decoded[start:end] = [None] * (end - start)
 
     def decrement_sound_delay_registers(self):
-        curtime = datetime.datetime.now()
-        if self.delay_register > 0:
-            tickdiff = int((curtime - self.delay_register_last_tick_time).total_seconds() * 1000000) // 16666
-            if tickdiff > 0:
-                self.delay_register -= tickdiff
-                if self.delay_register <= 0:
+        # Times are integer nanoseconds from time.perf_counter_ns().  Like the original hardware, both timers count
+        # down off one shared 60 Hz clock.  This is called once per frame; the last tick time only advances by whole
+        # ticks, so time left over between ticks carries forward instead of being dropped every frame.
+        curtime = time.perf_counter_ns()
+        ticks = (curtime - self.timer_last_tick_time) // TIMER_TICK_NS
+        if ticks > 0:
+            self.timer_last_tick_time += ticks * TIMER_TICK_NS
+            if self.delay_register > 0:
+                self.delay_register -= ticks
+                if self.delay_register < 0:
                     self.delay_register = 0
-                    self.delay_register_last_tick_time = None
-                else:
-                    self.delay_register_last_tick_time = curtime
-        if self.sound_register > 0:
-            tickdiff = int((curtime - self.sound_register_last_tick_time).total_seconds() * 1000000)  // 16666
-            if tickdiff > 0:
-                self.sound_register -= tickdiff
+            if self.sound_register > 0:
+                self.sound_register -= ticks
                 if self.sound_register <= 0:
                     self.sound_register = 0
-                    self.sound_register_last_tick_time = None
                     self.beep.stop()
-                else:
-                    self.sound_register_last_tick_time = curtime
-
-    def _0_opcodes(self, opcode, vx, vy, n, kk, nnn):
-        if opcode == 0x00E0:
-            # 00E0 - CLS
-            # clear the screen
-            self.screen.clear()
-        elif opcode == 0x00EE:
-            # 00EE - RET
-            # Return from a subroutine
-            assert len(self.stack) > 0
-            self.PC = self.stack.pop()
-        else:
-            raise InvalidOpCodeException(opcode)
+
+    def _00E0(self, opcode, vx, vy, n, kk, nnn):
+        # 00E0 - CLS
+        # clear the screen
+        self.screen.clear()
+        return True
+
+    def _00EE(self, opcode, vx, vy, n, kk, nnn):
+        # 00EE - RET
+        # Return from a subroutine
+        # An explicit check rather than an assert, so that it still applies under python -O.  Without it SP would go
+        # to -1 and stack[-1] would silently return from the last slot.
+        if not self.SP:
+            raise IndexError("stack underflow: RET with an empty stack")
+        self.SP -= 1
+        self.PC = self.stack[self.SP]
         return True
 
     def _1nnn(self, opcode, vx, vy, n, kk, nnn):
@@ -250,8 +232,9 @@ class C8Computer:
     def _2nnn(self, opcode, vx, vy, n, kk, nnn):
         # 2nnn - CALL addr
         # Call subroutine at nnn
-        self.stack.append(self.PC)
-        # Technically - should check for stack overflow but not going to worry about it
+        # Stack overflow raises IndexError when storing past the 16th slot
+        self.stack[self.SP] = self.PC
+        self.SP += 1
         self.PC = nnn
         return False
 
@@ -272,9 +255,8 @@ class C8Computer:
     def _5xy0(self, opcode, vx, vy, n, kk, nnn):
         # 5xy0 - SE Vx, Vy
         # Skip next instruction if Vx == Vy
-        if n != 0:
-            raise InvalidOpCodeException(opcode)
-        if self.V[vx] == self.V[vy]:
+        V = self.V
+        if V[vx] == V[vy]:
             self.PC += 2
         return True
 
@@ -287,112 +269,109 @@ class C8Computer:
     def _7xkk(self, opcode, vx, vy, n, kk, nnn):
         # 7xkk - ADD Vx, byte
         # Add value in kk to vx, stores result in vx, does NOT set overflow flag
-        self.V[vx] = (self.V[vx] + kk) & 0xFF
+        V = self.V
+        V[vx] = (V[vx] + kk) & 0xFF
         return True
 
-    def invalid_op(self, opcode, vx, vy):
+    def invalid_op(self, opcode, vx, vy, n, kk, nnn):
         raise InvalidOpCodeException(opcode)
 
-    def _8xy0(self, opcode, vx, vy):
+    def _8xy0(self, opcode, vx, vy, n, kk, nnn):
         # 8xy0 - LD Vx, Vy
         # Set Vx = Vy
-        self.V[vx] = self.V[vy]
+        V = self.V
+        V[vx] = V[vy]
         return True
 
-    def _8xy1(self, opcode, vx, vy):
+    def _8xy1(self, opcode, vx, vy, n, kk, nnn):
         # 8xy1 - OR Vx, Vy
         # Set Vx = Vx OR Vy.
         # Historical quick: this op also set VF = 0
-        self.V[vx] = self.V[vx] | self.V[vy]
-        self.V[0xF] = 0
+        V = self.V
+        V[vx] = V[vx] | V[vy]
+        V[0xF] = 0
         return True
 
-    def _8xy2(self, opcode, vx, vy):
+    def _8xy2(self, opcode, vx, vy, n, kk, nnn):
         # 8xy2 - AND Vx, Vy
         # Set Vx = Vx AND Vy
         # Historical quick: this op also set VF = 0
-        self.V[vx] = self.V[vx] & self.V[vy]
-        self.V[0xF] = 0
+        V = self.V
+        V[vx] = V[vx] & V[vy]
+        V[0xF] = 0
         return True
 
-    def _8xy3(self, opcode, vx, vy):
+    def _8xy3(self, opcode, vx, vy, n, kk, nnn):
         # 8xy3 - XOR Vx, Vy
         # Set Vx = Vx XOR Vy
         # Historical quick: this op also set VF = 0
-        self.V[vx] = self.V[vx] ^ self.V[vy]
-        self.V[0xF] = 0
+        V = self.V
+        V[vx] = V[vx] ^ V[vy]
+        V[0xF] = 0
         return True
 
-    def _8xy4(self, opcode, vx, vy):
+    def _8xy4(self, opcode, vx, vy, n, kk, nnn):
         # 8xy4 - ADD Vx, Vy
         # Set Vx = Vx + Vy, set VF = carry.  Must be done in this order.
-        sum = self.V[vx] + self.V[vy]
-        self.V[vx] = sum & 0xFF
-        if sum > 255:
-            self.V[0xF] = 1
-        else:
-            self.V[0xF] = 0
+        V = self.V
+        sum = V[vx] + V[vy]
+        V[vx] = sum & 0xFF
+        # sum is at most 0x1FE, so bit 8 is the carry
+        V[0xF] = sum >> 8
         return True
 
-    def _8xy5(self, opcode, vx, vy):
+    def _8xy5(self, opcode, vx, vy, n, kk, nnn):
         # 8xy5 - SUB Vx, Vy
         # Set Vx = Vx - Vy.  Set VF = NOT borrow (VF = 1 if Vx > Vy)
-        if self.V[vx] > self.V[vy]:
-            notborrow = 1
-        else:
-            notborrow = 0
-        self.V[vx] = (self.V[vx] - self.V[vy]) & 0xFF
-        self.V[0xF] = notborrow
+        V = self.V
+        # Vy - Vx is negative exactly when Vx > Vy, and shifting a negative int right leaves bit 0 set
+        notborrow = (V[vy] - V[vx]) >> 8 & 1
+        V[vx] = (V[vx] - V[vy]) & 0xFF
+        V[0xF] = notborrow
         return True
 
-    def _8xy6(self, opcode, vx, vy):
+    def _8xy6(self, opcode, vx, vy, n, kk, nnn):
         # 8xy6 - SHR Vx, Vy
         # ORIGINAL IMPLEMENTATION: copy Vy into Vx, then shift Vx right by 1.
         # MODERN IMPLEMENTATION: shift Vx right by 1 in place
         # In both, VF is set to the least significant bit of Vx before the shift
         # See: https://tobiasvl.github.io/blog/write-a-chip-8-emulator/#8xy6-and-8xye-shift
+        V = self.V
         if SHIFT_VY_8XY6_8XYE:
-            self.V[vx] = self.V[vy]
-        lsb = self.V[vx] & 0x1
-        self.V[vx] = self.V[vx] >> 1
-        self.V[0xF] = lsb
+            V[vx] = V[vy]
+        lsb = V[vx] & 0x1
+        V[vx] = V[vx] >> 1
+        V[0xF] = lsb
         return True
 
-    def _8xy7(self, opcode, vx, vy):
+    def _8xy7(self, opcode, vx, vy, n, kk, nnn):
         # 8xy7 - SUBN Vx, Vy
         # Set Vx = Vy - Vx.  Set VF = NOT borrow (VF = 1 if Vy > Vx)
-        if self.V[vy] > self.V[vx]:
-            notborrow = 1
-        else:
-            notborrow = 0
-        self.V[vx] = (self.V[vy] - self.V[vx]) & 0xFF
-        self.V[0xF] = notborrow
+        V = self.V
+        # Vx - Vy is negative exactly when Vy > Vx, and shifting a negative int right leaves bit 0 set
+        notborrow = (V[vx] - V[vy]) >> 8 & 1
+        V[vx] = (V[vy] - V[vx]) & 0xFF
+        V[0xF] = notborrow
         return True
 
-    def _8xyE(self, opcode, vx, vy):
+    def _8xyE(self, opcode, vx, vy, n, kk, nnn):
         # 8xyE - SHL Vx, Vy
         # ORIGINAL IMPLEMENTATION: copy Vy into Vx, then shift Vx left by 1.
         # MODERN IMPLEMENTATION: shift Vx left by 1 in place.
         # In both, VF is set to the most significant bit of Vx before the shift
+        V = self.V
         if SHIFT_VY_8XY6_8XYE:
-            self.V[vx] = self.V[vy]
-        msb = self.V[vx] & 0x80
-        self.V[vx] = (self.V[vx] << 1) & 0xFF
-        if msb:
-            self.V[0xF] = 0x1
-        else:
-            self.V[0xF] = 0x0
+            V[vx] = V[vy]
+        msb = V[vx] >> 7
+        V[vx] = (V[vx] << 1) & 0xFF
+        V[0xF] = msb
         return True
 
-    def _8_opcodes(self, opcode, vx, vy, n, kk, nnn):
-        return self._8_operations[n](opcode, vx, vy)
-
     def _9xy0(self, opcode, vx, vy, n, kk, nnn):
         # 9xy0 - SNE Vx, Vy
         # Skip next instruction if Vx != Vy
-        if n != 0:
-            raise InvalidOpCodeException(opcode)
-        if self.V[vx] != self.V[vy]:
+        V = self.V
+        if V[vx] != V[vy]:
             self.PC += 2
         return True
 
@@ -411,46 +390,56 @@ class C8Computer:
     def _Cxkk(self, opcode, vx, vy, n, kk, nnn):
         # Cxkk - RND Vx, byte
         # Set Vx = random byte AND kk
-        self.V[vx] = random.randrange(0, 255) & kk
+        # The random byte is the next one from the pool, which is refilled once it has all been used
+        self.V[vx] = self.random_pool[self.random_index] & kk
+        self.random_index = (self.random_index + 1) & 0xFFF
+        if not self.random_index:
+            self.random_pool = os.urandom(4096)
         return True
 
     def _Dxyn(self, opcode, vx, vy, n, kk, nnn):
         # See https://laurencescotford.com/chip-8-on-the-cosmac-vip-drawing-sprites/ for behavior
         # if sprite is being entirely written off screen.
-        x = self.V[vx] & 0x3F
-        y = self.V[vy] & 0x1F
-        memloc = self.I
-        collision = 0
-        for i in range(n):
-            if self.screen.xor8px(x, y + i, self.RAM[memloc]):
-                collision = 1
-            memloc += 1
-        self.V[0xF] = collision
-        self.screen.draw_rect_list.append((x, y, min([x + 8, self.screen.xsize]), min([y + n, self.screen.ysize])))
+        V = self.V
+        screen = self.screen
+        x = V[vx] & 0x3F
+        y = V[vy] & 0x1F
+        if screen.xor_sprite(x, y, self.RAM[self.I:ram_slice_end(self.I, n)]):
+            V[0xF] = 1
+        else:
+            V[0xF] = 0
+        # The dirty rect, clipped to the screen.  Plain comparisons, since this runs on every draw and min() is a
+        # full builtin call.
+        right = x + 8
+        if right > screen.xsize:
+            right = screen.xsize
+        bottom = y + n
+        if bottom > screen.ysize:
+            bottom = screen.ysize
+        screen.draw_rect_list.append((x, y, right, bottom))
         return True
 
-    def _E_opcodes(self, opcode, vx, vy, n, kk, nnn):
-        if kk == 0x9E:
-            # Ex9E - SKP Vx
-            # Skip next instruction if key with value of Vx is pressed
-            if self.keys_pressed[self.V[vx]]:
-                self.PC += 2
-        elif kk == 0xA1:
-            # ExA1 - SKNP Vx
-            # Skip next instruction if key with value of Vx is NOT pressed
-            if not self.keys_pressed[self.V[vx]]:
-                self.PC += 2
-        else:
-            raise InvalidOpCodeException(opcode)
+    def _Ex9E(self, opcode, vx, vy, n, kk, nnn):
+        # Ex9E - SKP Vx
+        # Skip next instruction if key with value of Vx is pressed
+        if self.keys_pressed[self.V[vx]]:
+            self.PC += 2
         return True
 
-    def _Fx07(self, vx):
+    def _ExA1(self, opcode, vx, vy, n, kk, nnn):
+        # ExA1 - SKNP Vx
+        # Skip next instruction if key with value of Vx is NOT pressed
+        if not self.keys_pressed[self.V[vx]]:
+            self.PC += 2
+        return True
+
+    def _Fx07(self, opcode, vx, vy, n, kk, nnn):
         # Fx07 - LD Vx, DT
         # The value of the Delay Timer is placed into Vx.
         self.V[vx] = self.delay_register
         return True
 
-    def _Fx0A(self, vx):
+    def _Fx0A(self, opcode, vx, vy, n, kk, nnn):
         # Fx0A - LD, Vx, Key
         # Wait for a key press, store the value of the key in Vx
         # NOTE: The original CHIP-8 waited until a key was pressed and then released.
@@ -471,80 +460,66 @@ class C8Computer:
                 increment_pc = True
         return increment_pc
 
-    def _Fx15(self, vx):
+    def _Fx15(self, opcode, vx, vy, n, kk, nnn):
         # Fx15 - LD DT, Vx
         # Set Delay Timer = Vx
         self.delay_register = self.V[vx]
-        if self.delay_register > 0:
-            self.delay_register_last_tick_time = datetime.datetime.now()
         return True
 
-    def _Fx18(self, vx):
+    def _Fx18(self, opcode, vx, vy, n, kk, nnn):
         # Fx18 - LD ST, Vx
         # Set Sound Timer = Vx
         self.sound_register = self.V[vx]
         if self.sound_register > 0:
-            self.sound_register_last_tick_time = datetime.datetime.now()
             self.beep.play(-1)
         return True
 
-    def _Fx1E(self, vx):
+    def _Fx1E(self, opcode, vx, vy, n, kk, nnn):
         # Fx1E - Set I = I + Vx - do not set the overflow flag
-        self.I += self.V[vx] & 0xFFF
+        # I holds a 12-bit address, so the sum wraps around the end of RAM
+        self.I = (self.I + self.V[vx]) & 0xFFF
         return True
 
-    def _Fx29(self, vx):
+    def _Fx29(self, opcode, vx, vy, n, kk, nnn):
         # Fx29 - LD F, Vx
         # Set I = location of sprite for digit Vx ("F" = Font)
-        # each character is 5 bytes, with "0" starting at 0x00 in memory
-        assert (self.V[vx] <= 0xF)
-        self.I = 5 * self.V[vx]
+        # Only digits 0..F have a sprite, so looking up a larger Vx fails with an IndexError
+        self.I = FONT_ADDRESSES[self.V[vx]]
         return True
 
-    def _Fx33(self, vx):
+    def _Fx33(self, opcode, vx, vy, n, kk, nnn):
         # Fx33 - LD B, Fx
         # Store binary coded decimal value of Vx in memory locations I, I+1, I+2
         # Convert Vx to base 10, place the hundreds digit in I, tens digit in I+1, ones in I+2
-        val = self.V[vx]
-        hundreds = val // 100
-        tens = (val - (100 * hundreds)) // 10
-        ones = val % 10
-        self.RAM[self.I] = hundreds
-        self.RAM[self.I + 1] = tens
-        self.RAM[self.I + 2] = ones
+        end = ram_slice_end(self.I, 3)
+        self.RAM[self.I:end] = BCD_DIGITS[self.V[vx]]
+        self._invalidate_decoded(self.I, end)
         return True
 
-    def _Fx55(self, vx):
+    def _Fx55(self, opcode, vx, vy, n, kk, nnn):
         # Fx55 - LD[I], Vx
         # Store registers V0 through Vx in memory starting at location I
         # Note that in the original CHIP-8 on the COSMAC VIP, I was incremented during this
         # loop.  See: https://laurencescotford.com/chip-8-on-the-cosmac-vip-loading-and-saving-variables/
         # However, modern interpreters do not increment I.  So need a config option in order to pass.
-        oldI = self.I
-        for i in range(vx + 1):
-            self.RAM[self.I] = self.V[i]
-            self.I += 1
-        if not INCREMENT_I_FX55_FX65:
-            self.I = oldI
+        # Copied as one slice
+        end = ram_slice_end(self.I, vx + 1)
+        self.RAM[self.I:end] = self.V[0:vx + 1]
+        self._invalidate_decoded(self.I, end)
+        if INCREMENT_I_FX55_FX65:
+            self.I = end
         return True
 
-    def _Fx65(self, vx):
+    def _Fx65(self, opcode, vx, vy, n, kk, nnn):
         # Fx65 - LD Vx, [I]
         # Read values from memory starting at location I into registers V0 through Vx
-        oldI = self.I
-        for i in range(vx + 1):
-            self.V[i] = self.RAM[self.I]
-            self.I += 1
-        if not INCREMENT_I_FX55_FX65:
-            self.I = oldI
+        # Copied as one slice
+        end = ram_slice_end(self.I, vx + 1)
+        self.V[0:vx + 1] = self.RAM[self.I:end]
+        if INCREMENT_I_FX55_FX65:
+            self.I = end
         return True
 
-    def _F_opcodes(self, opcode, vx, vy, n, kk, nnn):
-        if kk in self._F_operations.keys():
-            return self._F_operations[kk](vx)
-        else:
-            raise InvalidOpCodeException(opcode)
-
     def cycle(self, screen):
         '''
         Instructions have one of 6 patterns:
@@ -565,99 +540,200 @@ class C8Computer:
             Fx65
 
         To minimize redundant code, calculate all the possible ways
-        to parse the opcode and then later use only the ones that are needed
+        to parse the opcode and then later use only the ones that are needed.
+        decode() does that, along with finding the method that executes the
+        opcode, so all handlers share one signature.  Each address is decoded
+        only the first time it runs; after that the entry comes straight
+        from the self.decoded cache.
+
+        Executes one instruction; the loop itself lives in run_cycles().
         '''
 
-        opcode = self.fetch()
-        operation = opcode >> 12
-        vx = opcode >> 8 & 0xF
-        vy = opcode >> 4 & 0xF
-        n = opcode & 0xF
-        nnn = opcode & 0xFFF
-        kk = opcode & 0xFF
-        increment_pc = self.operation_list[operation](opcode, vx, vy, n, kk, nnn)
-        if increment_pc:
-            self.PC += 2
+        self.run_cycles(1)
+
+    def run_cycles(self, count):
+        # Execute count instructions back to back, so that the caller's per-iteration work (event handling, timing,
+        # drawing) is paid once per batch instead of once per instruction.  Everything the loop looks up is bound to
+        # locals once for the whole batch.
+        RAM = self.RAM
+        decoded = self.decoded
+        for i in range(count):
+            entry = decoded[self.PC]
+            if entry is None:
+                # Running off the end of RAM fails in read_opcode
+                entry = decoded[self.PC] = decode(read_opcode(RAM, self.PC)[0])
+            handler, opcode, vx, vy, n, kk, nnn = entry
+            if handler(self, opcode, vx, vy, n, kk, nnn):
+                self.PC += 2
+
+# Using tables of functions to speed the lookup, vs. doing a big nested if/else.  There is one instruction for each of
+# the high-order nibbles 1, 2, 3, 4, 5, 6, 7, 9, A, B, C, and D.  The others (0, 8, E, F) have multiple.
+OPERATIONS = [
+    None, C8Computer._1nnn, C8Computer._2nnn, C8Computer._3xkk, C8Computer._4xkk, C8Computer._5xy0,
+    C8Computer._6xkk, C8Computer._7xkk, None, C8Computer._9xy0, C8Computer._Annn, C8Computer._Bnnn,
+    C8Computer._Cxkk, C8Computer._Dxyn, None, None
+]
+
+# opcodes beginning with 8 can be determined based on the least-significant nibble (0..7 and E)
+OPERATIONS_8 = [
+    C8Computer._8xy0, C8Computer._8xy1, C8Computer._8xy2, C8Computer._8xy3, C8Computer._8xy4, C8Computer._8xy5,
+    C8Computer._8xy6, C8Computer._8xy7, C8Computer.invalid_op, C8Computer.invalid_op,
+    C8Computer.invalid_op, C8Computer.invalid_op, C8Computer.invalid_op, C8Computer.invalid_op,
+    C8Computer._8xyE, C8Computer.invalid_op
+]
+
+# opcodes beginning with 0, E, and F can be determined based on the least-significant byte.  Since these are sparse,
+# will use dictionaries.
+OPERATIONS_0 = {
+    0xE0: C8Computer._00E0,
+    0xEE: C8Computer._00EE
+}
+
+OPERATIONS_E = {
+    0x9E: C8Computer._Ex9E,
+    0xA1: C8Computer._ExA1
+}
+
+OPERATIONS_F = {
+    0x07: C8Computer._Fx07,
+    0x0A: C8Computer._Fx0A,
+    0x15: C8Computer._Fx15,
+    0x18: C8Computer._Fx18,
+    0x1E: C8Computer._Fx1E,
+    0x29: C8Computer._Fx29,
+    0x33: C8Computer._Fx33,
+    0x55: C8Computer._Fx55,
+    0x65: C8Computer._Fx65
+}
+
+
+def opcode_handler(opcode):
+    # Returns the C8Computer method that executes opcode, or invalid_op if it is not a valid instruction
+    operation = opcode >> 12
+    n = opcode & 0xF
+    kk = opcode & 0xFF
+    if operation == 0x0:
+        # 0nnn (SYS addr) is not supported, so only 00E0 and 00EE are valid
+        if opcode >> 8 == 0:
+            return OPERATIONS_0.get(kk, C8Computer.invalid_op)
+        return C8Computer.invalid_op
+    elif operation == 0x8:
+        return OPERATIONS_8[n]
+    elif operation == 0xE:
+        return OPERATIONS_E.get(kk, C8Computer.invalid_op)
+    elif operation == 0xF:
+        return OPERATIONS_F.get(kk, C8Computer.invalid_op)
+    elif operation in (0x5, 0x9) and n != 0:
+        # 5xy0 and 9xy0 must end in 0
+        return C8Computer.invalid_op
+    return OPERATIONS[operation]
+
+
+def decode(opcode):
+    # Splits opcode into (handler, opcode, vx, vy, n, kk, nnn).  C8Computer caches the result per address, so that
+    # executing an instruction is a single lookup and a single call, with no shifts, masks, or second-level dispatch.
+    return (opcode_handler(opcode), opcode, opcode >> 8 & 0xF, opcode >> 4 & 0xF, opcode & 0xF, opcode & 0xFF,
+            opcode & 0xFFF)
+
 
 class C8Screen:
     def __init__(self, window, pygame, xsize=64, ysize=32):
         self.xsize = xsize
         self.ysize = ysize
         self.pygame = pygame
-        self.vram = array('B', [0 for i in range(self.xsize * self.ysize)])
+        # One bit per pixel: each row of the screen is packed into a 64-bit integer, with x == 0 in the most
+        # significant bit actually in use.  That way drawing a sprite row is a single XOR.
+        self.rows = array('Q', [0 for i in range(self.ysize)])
+        # An all-off screen, copied over rows in a single slice assignment to clear it
+        self.blank_rows = array('Q', self.rows)
         self.window = window
         self.num_renders = 0
         self.render_time_ps = 0
         self.draw_rect_list = []
+        # The framebuffer is rendered at native CHIP-8 resolution onto this surface, which is then scaled up onto the
+        # window in a single call.  It shares the window's pixel format so the scale can write straight into it.
+        self.small = pygame.Surface((self.xsize, self.ysize), 0, self.window)
+        # Pixel values already mapped to the surface's format, indexed by the pixel's bit: [off, on]
+        self.palette = np.array([self.small.map_rgb(PIXEL_OFF), self.small.map_rgb(PIXEL_ON)], dtype=np.uint32)
+        # Start blank, with the whole screen marked for the first draw
         self.clear()
-        self.needs_draw = False
-        self.last_draw_time = datetime.datetime.now()
+        self.last_draw_time = time.perf_counter_ns()
 
     def clear(self):
-        for i in range(self.xsize * self.ysize):
-            self.vram[i] = 0
+        # The cleared screen goes out with the next frame's draw(), along with anything drawn after it this frame
+        self.rows[:] = self.blank_rows
         self.draw_rect_list.append((0, 0, self.xsize, self.ysize))
-        self.draw()
+        self.needs_draw = True
 
     def setpx(self, x, y, val):
-        assert val in (0, 1)
-        assert 0 <= x <= self.xsize
-        assert 0 <= y <= self.ysize
-        self.vram[(y * self.xsize) + x] = val
-
-    def xor8px(self, x, y, val):
-        assert 0 <= val <= 0xFF
-        assert 0 <= x
-        assert 0 <= y
-
-        # xors the 8 cells from (x,y) to (x+7,y) with the bits in val
-        vramcell = (y * self.xsize) + x
-
-        # avoid wrapping
-        numpx = min([8, self.xsize - x])
-        if y >= 32:
-            return
+        # An x past the right edge gives a negative shift and a y past the bottom is outside rows, so both still fail
+        bit = 1 << (self.xsize - 1 - x)
+        if val:
+            self.rows[y] |= bit
+        else:
+            self.rows[y] &= ~bit
 
-        collision = False
-
-        for i in range(numpx):
-            if (val << i) & 0x80:
-                # 0 means do nothing, so only treat the 1 case
-                if self.vram[vramcell] == 1:
-                    collision = True
-                    self.vram[vramcell] = 0
-                else:
-                    self.vram[vramcell] = 1
-            vramcell += 1
-        self.needs_draw = True
-        return collision
+    def xor_sprite(self, x, y, sprite):
+        # xors each byte of sprite into the 8 cells of successive rows, starting at (x,y).  Rows past the bottom of
+        # the screen are clipped.  Returns True if any pixel was turned off.
+        rows = self.rows
+        shift = self.xsize - 8
+        collision = 0
+        for val in sprite[:self.ysize - y]:
+            # Line the byte up with column x.  Any bits that would land past the right edge are shifted off the end,
+            # so the sprite is clipped rather than wrapped.
+            mask = (val << shift) >> x
+            row = rows[y]
+            rows[y] = row ^ mask
+            # a collision is any pixel that is turned off, i.e. was on and is XORed with a 1
+            collision |= row & mask
+            y += 1
+        if sprite:
+            self.needs_draw = True
+        return collision != 0
 
     def draw(self):
+        # Nothing has touched the screen since the last draw, so there is nothing to push to the display.
+        if not self.draw_rect_list:
+            return
         self.num_renders += 1
-        start_time = datetime.datetime.now()
-        pygamerects = []
+        start_time = time.perf_counter_ns()
+        # Unpack the rows big-endian so that the most significant bit, which is x == 0, comes out first.
+        pixels = np.unpackbits(np.array(self.rows, dtype='>u8').view(np.uint8)).reshape(self.ysize, 64)
+        pixels = pixels[:, 64 - self.xsize:]
+        # surfarray indexes surfaces as [x][y], so transpose from our [y, x] layout
+        pygame.surfarray.blit_array(self.small, self.palette[pixels.T])
+        rects = []
         for item in self.draw_rect_list:
-            for x in range(item[0], item[2]):
-                for y in range(item[1], item[3]):
-                    startx = x * SCALE_FACTOR
-                    starty = y * SCALE_FACTOR
-                    if self.vram[(y * self.xsize) + x] == 0:
-                        color = PIXEL_OFF
-                    else:
-                        color = PIXEL_ON
-                    for i in range(SCALE_FACTOR):
-                        for j in range(SCALE_FACTOR):
-                            self.window.set_at((startx + i, starty + j), color)
-            rectx = item[0] * SCALE_FACTOR
-            recty = item[1] * SCALE_FACTOR
-            rect_width = (item[2] - item[0]) * SCALE_FACTOR
-            rect_height = (item[3] - item[1]) * SCALE_FACTOR
-            pygamerects.append(pygame.Rect(rectx, recty, rect_width, rect_height))
-        pygame.display.update(pygamerects)
+            rect = pygame.Rect(item[0], item[1], item[2] - item[0], item[3] - item[1])
+            if not rect:
+                continue  # a zero-height sprite changes nothing
+            # A sprite erased and redrawn, or sprites drawn over each other, give overlapping rects.  Merge them so
+            # each area of the window is only scaled and pushed to the display once.
+            index = rect.collidelist(rects)
+            while index != -1:
+                rect.union_ip(rects.pop(index))
+                index = rect.collidelist(rects)
+            rects.append(rect)
+        # Scaling up to the window is most of the cost of a draw.  Past about half the screen, one full scale and flip
+        # is cheaper; otherwise only the dirty rects are scaled and pushed to the display.
+        dirty_area = sum(rect.width * rect.height for rect in rects)
+        if 2 * dirty_area > self.xsize * self.ysize:
+            pygame.transform.scale(self.small, self.window.get_size(), self.window)
+            pygame.display.flip()
+        else:
+            pygamerects = []
+            for rect in rects:
+                window_rect = pygame.Rect(rect.x * SCALE_FACTOR, rect.y * SCALE_FACTOR,
+                                          rect.width * SCALE_FACTOR, rect.height * SCALE_FACTOR)
+                pygame.transform.scale(self.small.subsurface(rect), window_rect.size,
+                                       self.window.subsurface(window_rect))
+                pygamerects.append(window_rect)
+            pygame.display.update(pygamerects)
         self.needs_draw = False
-        self.draw_rect_list = []
-        self.last_draw_time = datetime.datetime.now()
-        self.render_time_ps += (self.last_draw_time - start_time).total_seconds()
+        self.draw_rect_list.clear()
+        self.last_draw_time = time.perf_counter_ns()
+        self.render_time_ps += (self.last_draw_time - start_time) / 1000000000
 def main():
 
     global INCREMENT_I_FX55_FX65, SHIFT_VY_8XY6_8XYE, INSTRUCTION_DELAY
@@ -684,48 +760,62 @@ def main():
     start_time = datetime.datetime.now()
     num_instr = 0
 
-    timer_event = pygame.USEREVENT + 1
-    pygame.time.set_timer(timer_event, 17)  # 17ms ~= 60Hz
-
-    last_instruction_time = datetime.datetime.now()
-
-    while run:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-                c8.debug_dump()
-            elif event.type == pygame.KEYDOWN:
-                if event.key in KEYMAPPING.keys():
-                    c8.keys_pressed[KEYMAPPING[event.key]] = 1
-                    if c8.blocking_on_fx0a:
-                        c8.fx0a_key_pressed = KEYMAPPING[event.key]
-            elif event.type == pygame.KEYUP:
-                # we can get into a weird state if multiple keys are pressed, one, one is let up, and the other is
-                # pressed.
-                if event.key in KEYMAPPING.keys():
-                    c8.keys_pressed[KEYMAPPING[event.key]] = 0
-                    if c8.blocking_on_fx0a:
-                        if c8.fx0a_key_pressed == KEYMAPPING[event.key]:
-                            c8.fx0a_key_up = KEYMAPPING[event.key]
-                            c8.fx0a_key_pressed = None
-            elif event.type == timer_event:
-                c8.decrement_sound_delay_registers()
-
-
-        curtime = datetime.datetime.now()
-        tickdiff = ((curtime - last_instruction_time).total_seconds() * 1000000) / INSTRUCTION_DELAY
-        if tickdiff > 0:
-            try:
-                c8.cycle(myscreen)
-                num_instr += 1
-                last_instruction_time = curtime
-                if num_instr % 8 == 0:   # logic is that the CPU runs at 500 Hz and display at 60 Hz or 1/8th, roughly
-                    myscreen.draw()
-
-            except:
-                c8.debug_dump()
-                pygame.display.flip()
-                raise
+    # Everything is paced off a 60 Hz frame: poll events once, run the instructions that are due, tick the delay and
+    # sound timers, and draw.  Instructions are owed at one per INSTRUCTION_DELAY microseconds of real time, so the
+    # CPU speed stays exact even though frames are not exactly 1/60th of a second.  At the default delay that is a
+    # 500 Hz CPU, about 8 instructions per frame.
+    clock = pygame.time.Clock()
+    # If the loop stalls (e.g. the process was suspended or the system was busy), the debt is capped at four frames'
+    # worth of instructions and the rest is dropped rather than raced through.  Normal frames never reach the cap, so
+    # the CPU speed follows INSTRUCTION_DELAY however small it is set.
+    max_instructions_owed = max(4 * TIMER_TICK_NS / (INSTRUCTION_DELAY * 1000), 1)
+    instructions_owed = 0.0
+    last_frame_time = time.perf_counter_ns()
+
+    # Any error while emulating writes the machine state to debug.txt before propagating.  Only Exception is caught,
+    # so Ctrl-C still just stops the emulator.
+    try:
+        while run:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    run = False
+                    c8.debug_dump()
+                elif event.type == pygame.KEYDOWN:
+                    key = KEYMAPPING.get(event.key)
+                    if key is not None:
+                        c8.keys_pressed[key] = 1
+                        if c8.blocking_on_fx0a:
+                            c8.fx0a_key_pressed = key
+                elif event.type == pygame.KEYUP:
+                    # we can get into a weird state if multiple keys are pressed, one, one is let up, and the other is
+                    # pressed.
+                    key = KEYMAPPING.get(event.key)
+                    if key is not None:
+                        c8.keys_pressed[key] = 0
+                        if c8.blocking_on_fx0a:
+                            if c8.fx0a_key_pressed == key:
+                                c8.fx0a_key_up = key
+                                c8.fx0a_key_pressed = None
+
+            curtime = time.perf_counter_ns()
+            instructions_owed += (curtime - last_frame_time) / (INSTRUCTION_DELAY * 1000)
+            last_frame_time = curtime
+            if instructions_owed > max_instructions_owed:
+                instructions_owed = max_instructions_owed
+            batch = int(instructions_owed)
+            # keep only the fractional instruction still owed
+            instructions_owed -= batch
+
+            c8.run_cycles(batch)
+            num_instr += batch
+            c8.decrement_sound_delay_registers()
+            if myscreen.needs_draw:
+                myscreen.draw()
+            clock.tick(60)
+    except Exception:
+        c8.debug_dump()
+        pygame.display.flip()
+        raise
     end_time = datetime.datetime.now()
     duration = (end_time - start_time).total_seconds()
 